@@ -104,3 +104,23 @@ def test_show_disabled_logger_message(caplog, modflow_lib_path):
         mf6.logger.info("info shown")
         assert len(caplog.record_tuples) == 1
         assert "info shown" in caplog.text
+
+
+def test_debug_library_calls(caplog, modflow_lib_path):
+    mf6 = XmiWrapper(modflow_lib_path)
+
+    mf6.get_component_name()
+    assert len(caplog.record_tuples) == 0
+
+    # changing the level after construction should show the library calls
+    mf6.logger.setLevel(logging.DEBUG)
+
+    mf6.get_component_name()
+    assert len(caplog.record_tuples) == 1
+    assert "execute function: get_component_name" in caplog.text
+
+    caplog.clear()
+    mf6.logger.setLevel(logging.INFO)
+
+    mf6.get_component_name()
+    assert len(caplog.record_tuples) == 0
@@ -1,3 +1,5 @@
+from ctypes import create_string_buffer
+
 import numpy as np
 import pytest
 
@@ -107,6 +109,18 @@ def test_get_var_string(flopy_dis_mf6):
     assert mf6.get_value(name_tag).tolist() == ["TEST_MODEL_DIS"]
 
 
+def test_get_var_string_inplace(flopy_dis_mf6):
+    flopy_dis, mf6 = flopy_dis_mf6
+    mf6.initialize()
+
+    name_tag = mf6.get_var_address("NAME", flopy_dis.model_name)
+    dest = np.empty(1, dtype="<S17")
+    values = mf6.get_value(name_tag, dest)
+
+    assert values.tolist() == ["TEST_MODEL_DIS"]
+    assert dest.tolist() == [b"TEST_MODEL_DIS"]
+
+
 def test_set_var_string(flopy_dis_mf6):
     flopy_dis, mf6 = flopy_dis_mf6
     mf6.initialize()
@@ -135,6 +149,25 @@ def test_get_var_stringarray(flopy_dis_mf6):
     assert mf6.get_value(name_tag).tolist() == []
 
 
+def test_get_var_shape_cached(flopy_dis_mf6):
+    flopy_dis, mf6 = flopy_dis_mf6
+    mf6.initialize()
+
+    head_tag = mf6.get_var_address("X", flopy_dis.model_name)
+    expected_shape = [flopy_dis.nlay * flopy_dis.nrow * flopy_dis.ncol]
+    shape = mf6.get_var_shape(head_tag)
+    assert shape.tolist() == expected_shape
+
+    # modifying the returned shape should not affect later queries
+    shape[0] = -1
+    assert mf6.get_var_shape(head_tag).tolist() == expected_shape
+
+    # the shape is queried again after a restart of the library
+    mf6.finalize()
+    mf6.initialize()
+    assert mf6.get_var_shape(head_tag).tolist() == expected_shape
+
+
 def test_get_value_ptr_modelname(flopy_dis_mf6):
     """`flopy_dis` sets constant head values.
     This test checks if these can be properly extracted with origin=modelname."""
@@ -219,6 +252,21 @@ def test_get_output_var_names(flopy_dis_mf6):
     assert "SLN_1/IA" in var_names  # and this is readonly
 
 
+def test_decode_var_names():
+    len_address = 8
+    # fixed-width records, possibly with garbage after the \x00 terminator
+    names = create_string_buffer(
+        b"A/X\0\0\0\0\0" + b"SLN_1/IA" + b"B/Y\0zz\0\0", 3 * len_address
+    )
+    assert XmiWrapper._decode_var_names(names, len_address, 3) == (
+        "A/X",
+        "SLN_1/IA",
+        "B/Y",
+    )
+
+    assert XmiWrapper._decode_var_names(create_string_buffer(0), len_address, 0) == ()
+
+
 def test_get_var_units(flopy_dis_mf6):
     """Expects to be implemented as soon as `get_var_units` is implemented"""
     mf6 = flopy_dis_mf6[1]
@@ -279,6 +327,25 @@ def test_get_value_double_inplace(flopy_dis_mf6):
     )
 
 
+def test_get_values(flopy_dis_idomain_mf6):
+    flopy_dis, mf6 = flopy_dis_idomain_mf6
+    mf6.initialize()
+
+    head_tag = mf6.get_var_address("X", flopy_dis.model_name)
+    nodes_reduced_tag = mf6.get_var_address("NODEREDUCED", flopy_dis.model_name, "DIS")
+    id_tag = mf6.get_var_address("ID", flopy_dis.model_name)
+    head_arr = np.full(mf6.get_var_shape(head_tag), -99999.0)
+
+    values = mf6.get_values(
+        [head_tag, nodes_reduced_tag, id_tag], dests={head_tag: head_arr}
+    )
+
+    assert list(values) == [head_tag, nodes_reduced_tag, id_tag]
+    assert values[head_tag] is head_arr
+    for name, value in values.items():
+        np.testing.assert_array_equal(value, mf6.get_value_ptr(name))
+
+
 def test_get_value_int(flopy_dis_idomain_mf6):
     mf6 = flopy_dis_idomain_mf6[1]
     mf6.initialize()
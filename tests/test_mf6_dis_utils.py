@@ -1,3 +1,5 @@
+from pathlib import Path
+
 import pytest
 
 from xmipy import XmiWrapper
@@ -47,3 +49,23 @@ def test_dependencies(flopy_dis, modflow_lib_path):
         lib_dependency=modflow_lib_path,
         working_directory=flopy_dis.sim_path,
     )
+
+
+def test_chdir_once(flopy_dis, modflow_lib_path, request):
+    mf6 = XmiWrapper(
+        lib_path=modflow_lib_path,
+        working_directory=flopy_dis.sim_path,
+        chdir_once=True,
+    )
+    request.addfinalizer(mf6.__del__)
+    mf6.set_int("ISTDOUTTOFILE", 0)
+
+    prev_cwd = Path().cwd()
+    mf6.initialize()
+    assert Path().cwd().resolve() == Path(flopy_dis.sim_path).resolve()
+
+    mf6.update()
+    assert mf6.get_current_time() == 3.0
+
+    mf6.finalize()
+    assert Path().cwd() == prev_cwd
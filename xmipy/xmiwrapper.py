@@ -1,9 +1,18 @@
+# Note on performance: the work done in this module is bound by the latency
+# of calls into the library and of the Python code around them, not by
+# computation or memory bandwidth. Optimizations should therefore reduce the
+# overhead per call (caching, binding, avoiding allocations) rather than
+# vectorize. Decoding the variable name lists is the exception, its cost
+# grows with the number of variables, so the records are cut at their
+# terminators and decoded with numpy array operations.
 import logging
 import os
 import platform
+from contextlib import nullcontext
 from ctypes import (
     CDLL,
     POINTER,
+    Array,
     byref,
     c_char,
     c_char_p,
@@ -14,7 +23,18 @@ from ctypes import (
 )
 from enum import Enum, IntEnum, unique
 from pathlib import Path
-from typing import Any, Callable, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    List,
+    NoReturn,
+    Tuple,
+    Type,
+    Union,
+)
 
 import numpy as np
 from numpy.typing import NDArray
@@ -38,6 +58,15 @@ class State(Enum):
     INITIALIZED = 2
 
 
+# numpy types of numeric variables, keyed by the first three characters of
+# the (lower case) variable type reported by the kernel, e.g. "DOUBLE (90)"
+_NUMERIC_DTYPES: Dict[str, Type[np.number[Any]]] = {
+    "dou": np.float64,
+    "flo": np.float32,
+    "int": np.int32,
+}
+
+
 class XmiWrapper(Xmi):
     """The implementation of the XMI"""
 
@@ -48,6 +77,7 @@ class XmiWrapper(Xmi):
         working_directory: Union[str, Path, None] = None,
         timing: bool = False,
         logger_level: Union[str, int] = 0,
+        chdir_once: bool = False,
     ):
         """
         Constructor of `XmiWrapper`
@@ -65,24 +95,21 @@ class XmiWrapper(Xmi):
         DEBUG:libmf6.so: execute function: initialize(b'') returned 0
 
         In [4]: mf6.get_start_time()
-        DEBUG:libmf6.so: execute function: get_start_time(&c_double(0.0)) returned 0
+        DEBUG:libmf6.so: execute function: get_start_time(c_double(0.0)) returned 0
         Out[4]: 0.0
 
         In [5]: mf6.get_end_time()
-        DEBUG:libmf6.so: execute function: get_end_time(&c_double(504.0)) returned 0
+        DEBUG:libmf6.so: execute function: get_end_time(c_double(504.0)) returned 0
         Out[5]: 504.0
 
         In [6]: mf6.get_grid_rank(1)
-        DEBUG:libmf6.so: execute function: get_grid_rank(&c_int(1), &c_int(2)) returned 0
+        DEBUG:libmf6.so: execute function: get_grid_rank(c_int(1), c_int(2)) returned 0
         Out[6]: 2
 
         In [7]: mf6.get_value('SLN_1/MXITER')
-        DEBUG:libmf6.so: execute function: get_var_rank(c_char_p(b'SLN_1/MXITER'), &c_int(0)) returned 0
-        DEBUG:libmf6.so: execute function: get_var_type(c_char_p(b'SLN_1/MXITER'), &c_char_Array_51(b'INTEGER')) returned 0
-        DEBUG:libmf6.so: execute function: get_var_type(c_char_p(b'SLN_1/MXITER'), &c_char_Array_51(b'INTEGER')) returned 0
-        DEBUG:libmf6.so: execute function: get_value_ptr_int(c_char_p(b'SLN_1/MXITER'), &ndpointer_<i4_1d_1_C) returned 0
-        DEBUG:libmf6.so: execute function: get_var_type(c_char_p(b'SLN_1/MXITER'), &c_char_Array_51(b'INTEGER')) returned 0
-        DEBUG:libmf6.so: execute function: get_value_ptr_int(c_char_p(b'SLN_1/MXITER'), &ndpointer_<i4_1d_1_C) returned 0
+        DEBUG:libmf6.so: execute function: get_var_rank(b'SLN_1/MXITER', c_int(0)) returned 0
+        DEBUG:libmf6.so: execute function: get_var_type(b'SLN_1/MXITER', &c_char_Array_51(b'INTEGER')) returned 0
+        DEBUG:libmf6.so: execute function: get_value_ptr(b'SLN_1/MXITER', &ndpointer_<i4_1d_1_C) returned 0
         Out[7]: array([25], dtype=int32)
         ```
 
@@ -105,9 +132,58 @@ class XmiWrapper(Xmi):
             Logger level, default 0 ("NOTSET"). Accepted values are
             "DEBUG" (10), "INFO" (20), "WARNING" (30), "ERROR" (40) or
             "CRITICAL" (50).
+
+        chdir_once : bool, optional
+            Whether to change to the working directory once in `initialize`
+            and back in `finalize`, instead of around every call that might
+            access files, by default False. Only use this when no other code
+            depends on the current directory while the library is initialized,
+            so not when coupling kernels with different working directories.
         """
 
         self._state = State.UNINITIALIZED
+        self._const_cache: Dict[str, int] = {}
+        self._var_meta_cache: Dict[str, Tuple[int, str, Tuple[int, ...]]] = {}
+        self._name_cache: Dict[str, bytes] = {}
+        self._upper_cache: Dict[str, bytes] = {}
+        self._string_buffers: Dict[str, "Array[c_char]"] = {}
+
+        # reusable ctypes scalars passed to the library, to avoid allocating
+        # them on every call, every method has its own so calls from different
+        # threads into different methods don't share them
+        self._cd_update_until = c_double(0.0)
+        self._cd_current_time = c_double(0.0)
+        self._cd_start_time = c_double(0.0)
+        self._cd_end_time = c_double(0.0)
+        self._cd_time_step = c_double(0.0)
+        self._cd_prepare_time_step = c_double(0.0)
+        self._ci_input_item_count = c_int(0)
+        self._ci_output_item_count = c_int(0)
+        self._ci_subcomponent_count = c_int(0)
+        self._ci_var_grid = c_int(0)
+        self._ci_var_rank = c_int(0)
+        self._ci_var_itemsize = c_int(0)
+        self._ci_var_nbytes = c_int(0)
+        self._ci_grid_rank_grid = c_int(0)
+        self._ci_grid_rank = c_int(0)
+        self._ci_grid_size_grid = c_int(0)
+        self._ci_grid_size = c_int(0)
+        self._ci_grid_type_grid = c_int(0)
+        self._ci_grid_shape_grid = c_int(0)
+        self._ci_grid_x_grid = c_int(0)
+        self._ci_grid_y_grid = c_int(0)
+        self._ci_grid_z_grid = c_int(0)
+        self._ci_grid_node_count_grid = c_int(0)
+        self._ci_grid_node_count = c_int(0)
+        self._ci_grid_face_count_grid = c_int(0)
+        self._ci_grid_face_count = c_int(0)
+        self._ci_grid_face_nodes_grid = c_int(0)
+        self._ci_grid_nodes_per_face_grid = c_int(0)
+        self._ci_prepare_solve_component = c_int(0)
+        self._ci_solve_component = c_int(0)
+        self._ci_solve_converged = c_int(0)
+        self._ci_finalize_solve_component = c_int(0)
+
         self.libname = Path(lib_path).name
         self.logger = get_logger(self.libname, logger_level)
 
@@ -119,12 +195,15 @@ class XmiWrapper(Xmi):
         # Note: this could make xmipy less secure (dll-injection)
         # Can we get it to work without this flag?
         self.lib = CDLL(str(lib_path), winmode=0x08)
+        self._bind_functions()
 
         if working_directory:
             self.working_directory = Path(working_directory)
         else:
             self.working_directory = Path().cwd()
         self.timing = timing
+        self.chdir_once = chdir_once
+        self._prev_cwd: Union[Path, None] = None
 
         if self.timing:
             self.timer = Timer(
@@ -150,6 +229,103 @@ class XmiWrapper(Xmi):
             else:
                 os.environ["LD_LIBRARY_PATH"] = lib_dependency
 
+    def _bind_functions(self) -> None:
+        # bind the library functions once with their argument types, so ctypes
+        # doesn't have to look up the function and guess the conversion of its
+        # arguments on every call
+        self._fn_initialize = self._bind("initialize", [c_char_p])
+        self._fn_update = self._bind("update", [])
+        self._fn_update_until = self._bind("update_until", [c_double])
+        self._fn_finalize = self._bind("finalize", [])
+        self._fn_get_current_time = self._bind("get_current_time", [POINTER(c_double)])
+        self._fn_get_start_time = self._bind("get_start_time", [POINTER(c_double)])
+        self._fn_get_end_time = self._bind("get_end_time", [POINTER(c_double)])
+        self._fn_get_time_step = self._bind("get_time_step", [POINTER(c_double)])
+        self._fn_get_component_name = self._bind("get_component_name", [c_void_p])
+        self._fn_get_version = self._bind("get_version", [c_void_p])
+        self._fn_get_input_item_count = self._bind(
+            "get_input_item_count", [POINTER(c_int)]
+        )
+        self._fn_get_output_item_count = self._bind(
+            "get_output_item_count", [POINTER(c_int)]
+        )
+        self._fn_get_input_var_names = self._bind("get_input_var_names", [c_void_p])
+        self._fn_get_output_var_names = self._bind("get_output_var_names", [c_void_p])
+        self._fn_get_var_grid = self._bind("get_var_grid", [c_char_p, POINTER(c_int)])
+        self._fn_get_var_type = self._bind("get_var_type", [c_char_p, c_void_p])
+        self._fn_get_var_shape = self._bind("get_var_shape", [c_char_p, c_void_p])
+        self._fn_get_var_rank = self._bind("get_var_rank", [c_char_p, POINTER(c_int)])
+        self._fn_get_var_itemsize = self._bind(
+            "get_var_itemsize", [c_char_p, POINTER(c_int)]
+        )
+        self._fn_get_var_nbytes = self._bind(
+            "get_var_nbytes", [c_char_p, POINTER(c_int)]
+        )
+        self._fn_get_value = self._bind("get_value", [c_char_p, c_void_p])
+        self._fn_get_value_ptr = self._bind("get_value_ptr", [c_char_p, c_void_p])
+        self._fn_set_value = self._bind("set_value", [c_char_p, c_void_p])
+        self._fn_get_grid_rank = self._bind(
+            "get_grid_rank", [POINTER(c_int), POINTER(c_int)]
+        )
+        self._fn_get_grid_size = self._bind(
+            "get_grid_size", [POINTER(c_int), POINTER(c_int)]
+        )
+        self._fn_get_grid_type = self._bind("get_grid_type", [POINTER(c_int), c_void_p])
+        self._fn_get_grid_shape = self._bind(
+            "get_grid_shape", [POINTER(c_int), c_void_p]
+        )
+        self._fn_get_grid_x = self._bind("get_grid_x", [POINTER(c_int), c_void_p])
+        self._fn_get_grid_y = self._bind("get_grid_y", [POINTER(c_int), c_void_p])
+        self._fn_get_grid_z = self._bind("get_grid_z", [POINTER(c_int), c_void_p])
+        self._fn_get_grid_node_count = self._bind(
+            "get_grid_node_count", [POINTER(c_int), POINTER(c_int)]
+        )
+        self._fn_get_grid_face_count = self._bind(
+            "get_grid_face_count", [POINTER(c_int), POINTER(c_int)]
+        )
+        self._fn_get_grid_face_nodes = self._bind(
+            "get_grid_face_nodes", [POINTER(c_int), c_void_p]
+        )
+        self._fn_get_grid_nodes_per_face = self._bind(
+            "get_grid_nodes_per_face", [POINTER(c_int), c_void_p]
+        )
+        self._fn_prepare_time_step = self._bind(
+            "prepare_time_step", [POINTER(c_double)]
+        )
+        self._fn_do_time_step = self._bind("do_time_step", [])
+        self._fn_finalize_time_step = self._bind("finalize_time_step", [])
+        self._fn_get_subcomponent_count = self._bind(
+            "get_subcomponent_count", [POINTER(c_int)]
+        )
+        self._fn_prepare_solve = self._bind("prepare_solve", [POINTER(c_int)])
+        self._fn_solve = self._bind("solve", [POINTER(c_int), POINTER(c_int)])
+        self._fn_finalize_solve = self._bind("finalize_solve", [POINTER(c_int)])
+        self._fn_get_var_address = self._bind(
+            "get_var_address", [c_char_p, c_char_p, c_char_p, c_void_p]
+        )
+
+    def _bind(self, name: str, argtypes: List[Any]) -> Callable[..., int]:
+        function = self.lib[name]
+        function.argtypes = argtypes
+        function.restype = c_int
+        return function
+
+    def _working_directory(self) -> ContextManager[None]:
+        # with chdir_once, we are already in the working directory
+        if self.chdir_once:
+            return nullcontext()
+        return cd(self.working_directory)
+
+    def _enter_working_directory(self) -> None:
+        if self.chdir_once:
+            self._prev_cwd = Path().cwd()
+            os.chdir(self.working_directory)
+
+    def _restore_working_directory(self) -> None:
+        if self._prev_cwd is not None:
+            os.chdir(self._prev_cwd)
+            self._prev_cwd = None
+
     def report_timing_totals(self) -> float:
         if self.timing:
             total = self.timer.report_totals()
@@ -164,87 +340,118 @@ class XmiWrapper(Xmi):
             raise TimerError("Timing not activated")
 
     def get_constant_int(self, name: str) -> int:
-        c_var = c_int.in_dll(self.lib, name)
-        return c_var.value
+        # constants such as BMI_LENVARADDRESS never change during a run,
+        # cache them to avoid resolving the symbol in the library every call
+        try:
+            return self._const_cache[name]
+        except KeyError:
+            value = c_int.in_dll(self.lib, name).value
+            self._const_cache[name] = value
+            return value
+
+    def _string_buffer(self, len_constant: str) -> "Array[c_char]":
+        """
+        Return a reusable string buffer with the length given by the constant,
+        the kernel writes \x00 terminated strings so the buffer is safe to reuse
+        """
+        try:
+            return self._string_buffers[len_constant]
+        except KeyError:
+            buffer = create_string_buffer(self.get_constant_int(len_constant))
+            self._string_buffers[len_constant] = buffer
+            return buffer
 
     def set_int(self, name: str, value: int) -> None:
         c_var = c_int.in_dll(self.lib, name)
         c_var.value = value
+        self._const_cache.pop(name, None)
 
     def initialize(self, config_file: str = "") -> None:
         if self._state == State.UNINITIALIZED:
-            with cd(self.working_directory):
-                self._execute_function(self.lib.initialize, config_file.encode())
-                self._state = State.INITIALIZED
+            self._enter_working_directory()
+            try:
+                with self._working_directory():
+                    self._execute_function(self._fn_initialize, config_file.encode())
+                    self._state = State.INITIALIZED
+            except Exception:
+                self._restore_working_directory()
+                raise
         else:
             raise InputError("The library is already initialized")
 
     def initialize_mpi(self, value: int) -> None:
         if self._state == State.UNINITIALIZED:
-            with cd(self.working_directory):
-                comm = c_int(value)
-                self._execute_function(self.lib.initialize_mpi, byref(comm))
-                self._state = State.INITIALIZED
+            self._enter_working_directory()
+            try:
+                with self._working_directory():
+                    # only exported by parallel builds of the library, so it is
+                    # bound here instead of with the other functions
+                    initialize_mpi = self._bind("initialize_mpi", [POINTER(c_int)])
+                    comm = c_int(value)
+                    self._execute_function(initialize_mpi, comm)
+                    self._state = State.INITIALIZED
+            except Exception:
+                self._restore_working_directory()
+                raise
         else:
             raise InputError("The library is already initialized")
 
     def update(self) -> None:
-        with cd(self.working_directory):
-            self._execute_function(self.lib.update)
+        with self._working_directory():
+            self._execute_function(self._fn_update)
 
     def update_until(self, time: float) -> None:
-        with cd(self.working_directory):
-            self._execute_function(self.lib.update_until, c_double(time))
+        with self._working_directory():
+            self._cd_update_until.value = time
+            self._execute_function(self._fn_update_until, self._cd_update_until)
 
     def finalize(self) -> None:
         if self._state == State.INITIALIZED:
-            with cd(self.working_directory):
-                self._execute_function(self.lib.finalize)
-                self._state = State.UNINITIALIZED
+            try:
+                with self._working_directory():
+                    self._execute_function(self._fn_finalize)
+                    self._state = State.UNINITIALIZED
+                    self._var_meta_cache.clear()
+            finally:
+                self._restore_working_directory()
         else:
             raise InputError("The library is not initialized yet")
 
     def get_current_time(self) -> float:
-        current_time = c_double(0.0)
-        self._execute_function(self.lib.get_current_time, byref(current_time))
-        return current_time.value
+        self._execute_function(self._fn_get_current_time, self._cd_current_time)
+        return self._cd_current_time.value
 
     def get_start_time(self) -> float:
-        start_time = c_double(0.0)
-        self._execute_function(self.lib.get_start_time, byref(start_time))
-        return start_time.value
+        self._execute_function(self._fn_get_start_time, self._cd_start_time)
+        return self._cd_start_time.value
 
     def get_end_time(self) -> float:
-        end_time = c_double(0.0)
-        self._execute_function(self.lib.get_end_time, byref(end_time))
-        return end_time.value
+        self._execute_function(self._fn_get_end_time, self._cd_end_time)
+        return self._cd_end_time.value
 
     def get_time_step(self) -> float:
-        dt = c_double(0.0)
-        self._execute_function(self.lib.get_time_step, byref(dt))
-        return dt.value
+        self._execute_function(self._fn_get_time_step, self._cd_time_step)
+        return self._cd_time_step.value
 
     def get_component_name(self) -> str:
-        len_name = self.get_constant_int("BMI_LENCOMPONENTNAME")
-        component_name = create_string_buffer(len_name)
-        self._execute_function(self.lib.get_component_name, byref(component_name))
+        component_name = self._string_buffer("BMI_LENCOMPONENTNAME")
+        self._execute_function(self._fn_get_component_name, byref(component_name))
         return component_name.value.decode("ascii")
 
     def get_version(self) -> str:
-        len_version = self.get_constant_int("BMI_LENVERSION")
-        version = create_string_buffer(len_version)
-        self._execute_function(self.lib.get_version, byref(version))
+        version = self._string_buffer("BMI_LENVERSION")
+        self._execute_function(self._fn_get_version, byref(version))
         return version.value.decode("ascii")
 
     def get_input_item_count(self) -> int:
-        count = c_int(0)
-        self._execute_function(self.lib.get_input_item_count, byref(count))
-        return count.value
+        self._execute_function(self._fn_get_input_item_count, self._ci_input_item_count)
+        return self._ci_input_item_count.value
 
     def get_output_item_count(self) -> int:
-        count = c_int(0)
-        self._execute_function(self.lib.get_output_item_count, byref(count))
-        return count.value
+        self._execute_function(
+            self._fn_get_output_item_count, self._ci_output_item_count
+        )
+        return self._ci_output_item_count.value
 
     def get_input_var_names(self) -> Tuple[str]:
         len_address = self.get_constant_int("BMI_LENVARADDRESS")
@@ -254,16 +461,9 @@ class XmiWrapper(Xmi):
 
         # get a (1-dim) char array (char*) containing the input variable
         # names as \x00 terminated sub-strings
-        self._execute_function(self.lib.get_input_var_names, byref(names))
+        self._execute_function(self._fn_get_input_var_names, byref(names))
 
-        # decode
-        input_vars: Tuple[str] = tuple(
-            names[i * len_address : (i + 1) * len_address]  # type: ignore
-            .split(b"\0", 1)[0]
-            .decode("ascii")
-            for i in range(nr_input_vars)
-        )
-        return input_vars
+        return self._decode_var_names(names, len_address, nr_input_vars)
 
     def get_output_var_names(self) -> Tuple[str]:
         len_address = self.get_constant_int("BMI_LENVARADDRESS")
@@ -273,76 +473,65 @@ class XmiWrapper(Xmi):
 
         # get a (1-dim) char array (char*) containing the output variable
         # names as \x00 terminated sub-strings
-        self._execute_function(self.lib.get_output_var_names, byref(names))
+        self._execute_function(self._fn_get_output_var_names, byref(names))
+
+        return self._decode_var_names(names, len_address, nr_output_vars)
 
-        # decode
-        output_vars: Tuple[str] = tuple(
-            names[i * len_address : (i + 1) * len_address]  # type: ignore
-            .split(b"\0", 1)[0]
-            .decode("ascii")
-            for i in range(nr_output_vars)
+    @staticmethod
+    def _decode_var_names(
+        names: "Array[c_char]", len_address: int, count: int
+    ) -> Tuple[str]:
+        if count == 0:
+            return ()  # type: ignore
+
+        # view the buffer as a (count, len_address) block of chars with each row
+        # holding one name, and blank out everything from the first \x00 on so
+        # each row reads as a fixed-width record with just its name
+        chars = np.frombuffer(
+            memoryview(names), dtype=np.uint8, count=count * len_address
         )
-        return output_vars
+        chars = chars.reshape(count, len_address)
+        chars = np.where(np.cumsum(chars == 0, axis=1) > 0, 0, chars)
+        records = chars.view(f"S{len_address}")[:, 0]
+        var_names: Tuple[str] = tuple(np.char.decode(records, "ascii").tolist())
+        return var_names
 
     def get_var_grid(self, name: str) -> int:
-        grid_id = c_int(0)
         self._execute_function(
-            self.lib.get_var_grid,
-            c_char_p(name.encode()),
-            byref(grid_id),
+            self._fn_get_var_grid,
+            self._cname(name),
+            self._ci_var_grid,
         )
-        return grid_id.value
+        return self._ci_var_grid.value
 
     def get_var_type(self, name: str) -> str:
-        len_var_type = self.get_constant_int("BMI_LENVARTYPE")
-        var_type = create_string_buffer(len_var_type)
-        self._execute_function(
-            self.lib.get_var_type,
-            c_char_p(name.encode()),
-            byref(var_type),
-        )
-        return var_type.value.decode()
+        return self._get_var_meta(name)[1]
 
     # strictly speaking not BMI...
     def get_var_shape(self, name: str) -> NDArray[np.int32]:
-        rank = self.get_var_rank(name)
-        array = np.zeros(rank, dtype=np.int32)
-        self._execute_function(
-            self.lib.get_var_shape,
-            c_char_p(name.encode()),
-            c_void_p(array.ctypes.data),
-        )
-        return array
+        return np.array(self._get_var_meta(name)[2], dtype=np.int32)
 
     def get_var_rank(self, name: str) -> int:
-        rank = c_int(0)
-        self._execute_function(
-            self.lib.get_var_rank,
-            c_char_p(name.encode()),
-            byref(rank),
-        )
-        return rank.value
+        return self._get_var_meta(name)[0]
 
     def get_var_units(self, name: str) -> str:
         raise NotImplementedError
 
     def get_var_itemsize(self, name: str) -> int:
-        item_size = c_int(0)
         self._execute_function(
-            self.lib.get_var_itemsize,
-            c_char_p(name.encode()),
-            byref(item_size),
+            self._fn_get_var_itemsize,
+            self._cname(name),
+            self._ci_var_itemsize,
         )
-        return item_size.value
+        return self._ci_var_itemsize.value
 
     def get_var_nbytes(self, name: str) -> int:
-        nbytes = c_int(0)
         self._execute_function(
-            self.lib.get_var_nbytes,
-            c_char_p(name.encode()),
-            byref(nbytes),
+            self._fn_get_var_nbytes,
+            self._cname(name),
+            self._ci_var_nbytes,
         )
-        return nbytes.value
+        return self._ci_var_nbytes.value
 
     def get_var_location(self, name: str) -> str:
         raise NotImplementedError
@@ -357,128 +546,143 @@ class XmiWrapper(Xmi):
         if dest is not None and not dest.flags["C"]:
             raise InputError("Array should have C layout")
 
-        # first deal with scalars
-        rank = self.get_var_rank(name)
-        var_type = self.get_var_type(name)
-        var_type_lower = var_type.lower()
+        meta = self._get_var_meta(name)
+        rank, var_type, var_shape = meta
 
-        if rank == 0:
-            if var_type_lower.startswith("string"):
+        if var_type[:3].lower() != "str":
+            return self._get_numeric_value(name, meta, dest)
+
+        if dest is None:
+            if rank == 0:
                 ilen = self.get_var_nbytes(name)
-                strtype = "<S" + str(ilen + 1)
-                if dest is None:
-                    dest = np.empty(1, dtype=strtype, order="C")
-                self._execute_function(
-                    self.lib.get_value,
-                    c_char_p(name.encode()),
-                    byref(dest.ctypes.data_as(POINTER(c_char))),
-                )
-                dest[0] = dest[0].decode("ascii").strip()
-                return dest.astype(str)
+                dest = np.empty(1, dtype="<S" + str(ilen + 1), order="C")
             else:
-                src = self.get_value_ptr_scalar(name)
-                if dest is None:
-                    return self.get_value_ptr_scalar(name).copy()
-                else:
-                    dest[0] = src[0]
-                    return dest
-
-        var_shape = self.get_var_shape(name)
-
-        if var_type_lower.startswith("double"):
-            if dest is None:
-                dest = np.empty(shape=var_shape, dtype=np.float64, order="C")
-            self._execute_function(
-                self.lib.get_value,
-                c_char_p(name.encode()),
-                byref(dest.ctypes.data_as(POINTER(c_double))),
-            )
-        elif var_type_lower.startswith("int"):
-            if dest is None:
-                dest = np.empty(shape=var_shape, dtype=np.int32, order="C")
-            self._execute_function(
-                self.lib.get_value,
-                c_char_p(name.encode()),
-                byref(dest.ctypes.data_as(POINTER(c_int))),
-            )
-        elif var_type_lower.startswith("string"):
-            if dest is None:
                 if var_shape[0] == 0:
                     return np.empty((0,), "U1")
                 ilen = self.get_var_nbytes(name) // var_shape[0]
                 strtype = "<S" + str(ilen + 1)
                 dest = np.empty(var_shape[0], dtype=strtype, order="C")
-            self._execute_function(
-                self.lib.get_value,
-                c_char_p(name.encode()),
-                byref(dest.ctypes.data_as(POINTER(c_char))),
-            )
-            for i, x in enumerate(dest):
-                dest[i] = x.decode("ascii").strip()
-            return dest.astype(str)
-        else:
+        self._execute_function(
+            self._fn_get_value,
+            self._cname(name),
+            byref(c_void_p(dest.ctypes.data)),
+        )
+        values = np.char.strip(np.char.decode(dest, "ascii"))
+        # dest holds the stripped values as well, like the values returned
+        dest[...] = np.char.encode(values, "ascii")
+        return values
+
+    # strictly speaking not BMI...
+    def get_values(
+        self,
+        names: Iterable[str],
+        dests: Union[Dict[str, NDArray[Any]], None] = None,
+    ) -> Dict[str, NDArray[Any]]:
+        """
+        Get copies of the values of several variables, like calling `get_value`
+        for each name, but with the bookkeeping per variable kept to a minimum.
+
+        Parameters
+        ----------
+        names : Iterable[str]
+            Names of the variables.
+        dests : Dict[str, NDArray[Any]], optional
+            Arrays to copy values into, by variable name. Variables without
+            an entry get a newly allocated array.
+
+        Returns
+        -------
+        Dict[str, NDArray[Any]]
+            The values by variable name.
+        """
+        if dests is None:
+            dests = {}
+
+        values = {}
+        for name in names:
+            dest = dests.get(name)
+            meta = self._get_var_meta(name)
+            if meta[1][:3].lower() == "str":
+                # strings need the special handling of get_value
+                values[name] = self.get_value(name, dest)
+                continue
+
+            if dest is not None and not dest.flags["C"]:
+                raise InputError("Array should have C layout")
+            values[name] = self._get_numeric_value(name, meta, dest)
+        return values
+
+    def _get_numeric_value(
+        self,
+        name: str,
+        meta: Tuple[int, str, Tuple[int, ...]],
+        dest: Union[NDArray[Any], None],
+    ) -> NDArray[Any]:
+        """
+        Return a copy of the value of a numeric variable, shared by `get_value`
+        and `get_values`, `dest` should already be checked for C layout
+        """
+        rank, var_type, var_shape = meta
+        dtype = _NUMERIC_DTYPES.get(var_type[:3].lower())
+        if dtype is None:
             raise InputError(f"Unsupported value type {var_type!r}")
 
+        # scalars are read through their pointer
+        if rank == 0:
+            src = self.get_value_ptr_scalar(name)
+            if dest is None:
+                return src.copy()
+            dest[0] = src[0]
+            return dest
+
+        if dest is None:
+            # copying the array the kernel points to gives the same result,
+            # this does not work for empty arrays, which have no valid pointer
+            if all(var_shape):
+                return self.get_value_ptr(name).copy()
+            dest = np.empty(shape=var_shape, dtype=dtype, order="C")
+        self._execute_function(
+            self._fn_get_value,
+            self._cname(name),
+            byref(c_void_p(dest.ctypes.data)),
+        )
         return dest
 
     def get_value_ptr(self, name: str) -> NDArray[Any]:
         # first scalars
-        rank = self.get_var_rank(name)
+        rank, var_type, shape_tuple = self._get_var_meta(name)
         if rank == 0:
             return self.get_value_ptr_scalar(name)
 
-        var_type = self.get_var_type(name)
-        var_type_lower = var_type.lower()
-        shape_array = self.get_var_shape(name)
-
-        # convert shape array to python tuple
-        shape_tuple = tuple(np.trim_zeros(shape_array))
-        ndim = len(shape_tuple)
-
-        if var_type_lower.startswith("double"):
-            arraytype = np.ctypeslib.ndpointer(
-                dtype=np.float64, ndim=ndim, shape=shape_tuple, flags="C"
-            )
-        elif var_type_lower.startswith("float"):
-            arraytype = np.ctypeslib.ndpointer(
-                dtype=np.float32, ndim=ndim, shape=shape_tuple, flags="C"
-            )
-        elif var_type_lower.startswith("int"):
-            arraytype = np.ctypeslib.ndpointer(
-                dtype=np.int32, ndim=ndim, shape=shape_tuple, flags="C"
-            )
-        else:
+        dtype = _NUMERIC_DTYPES.get(var_type[:3].lower())
+        if dtype is None:
             raise InputError(f"Unsupported value type {var_type!r}")
+
+        # numpy caches the pointer types by dtype, ndim, shape and flags, so
+        # repeated calls for the same variable don't build a new class
+        arraytype = np.ctypeslib.ndpointer(
+            dtype=dtype, ndim=rank, shape=shape_tuple, flags="C"
+        )
         values = arraytype()
         self._execute_function(
-            self.lib.get_value_ptr,
-            c_char_p(name.encode()),
+            self._fn_get_value_ptr,
+            self._cname(name),
             byref(values),
             detail="for variable " + name,
         )
         return values.contents
 
     def get_value_ptr_scalar(self, name: str) -> NDArray[Any]:
-        var_type = self.get_var_type(name)
-        var_type_lower = var_type.lower()
-        if var_type_lower.startswith("double"):
-            arraytype = np.ctypeslib.ndpointer(
-                dtype=np.float64, ndim=1, shape=(1,), flags="C"
-            )
-        elif var_type_lower.startswith("float"):
-            arraytype = np.ctypeslib.ndpointer(
-                dtype=np.float32, ndim=1, shape=(1,), flags="C"
-            )
-        elif var_type_lower.startswith("int"):
-            arraytype = np.ctypeslib.ndpointer(
-                dtype=np.int32, ndim=1, shape=(1,), flags="C"
-            )
-        else:
+        var_type = self._get_var_meta(name)[1]
+        dtype = _NUMERIC_DTYPES.get(var_type[:3].lower())
+        if dtype is None:
             raise InputError(f"Unsupported value type {var_type!r}")
+
+        arraytype = np.ctypeslib.ndpointer(dtype=dtype, ndim=1, shape=(1,), flags="C")
         values = arraytype()
         self._execute_function(
-            self.lib.get_value_ptr,
-            c_char_p(name.encode()),
+            self._fn_get_value_ptr,
+            self._cname(name),
             byref(values),
             detail="for variable " + name,
         )
@@ -492,26 +696,17 @@ class XmiWrapper(Xmi):
     def set_value(self, name: str, values: NDArray[Any]) -> None:
         if not values.flags["C"]:
             raise InputError("Array should have C layout")
-        var_type = self.get_var_type(name)
-        var_type_lower = var_type.lower()
-        if var_type_lower.startswith("double"):
-            if values.dtype != np.float64:
-                raise InputError("Array should have float64 elements")
-            self._execute_function(
-                self.lib.set_value,
-                c_char_p(name.encode()),
-                byref(values.ctypes.data_as(POINTER(c_double))),
-            )
-        elif var_type_lower.startswith("int"):
-            if values.dtype != np.int32:
-                raise InputError("Array should have int32 elements")
-            self._execute_function(
-                self.lib.set_value,
-                c_char_p(name.encode()),
-                byref(values.ctypes.data_as(POINTER(c_int))),
-            )
-        else:
+        var_type = self._get_var_meta(name)[1]
+        dtype = _NUMERIC_DTYPES.get(var_type[:3].lower())
+        if dtype is None:
             raise InputError("Unsupported value type")
+        if values.dtype != dtype:
+            raise InputError(f"Array should have {np.dtype(dtype).name} elements")
+        self._execute_function(
+            self._fn_set_value,
+            self._cname(name),
+            byref(c_void_p(values.ctypes.data)),
+        )
 
     def set_value_at_indices(
         self, name: str, inds: NDArray[Any], src: NDArray[Any]
@@ -519,41 +714,38 @@ class XmiWrapper(Xmi):
         raise NotImplementedError
 
     def get_grid_rank(self, grid: int) -> int:
-        grid_rank = c_int(0)
-        c_grid = c_int(grid)
+        self._ci_grid_rank_grid.value = grid
         self._execute_function(
-            self.lib.get_grid_rank,
-            byref(c_grid),
-            byref(grid_rank),
+            self._fn_get_grid_rank,
+            self._ci_grid_rank_grid,
+            self._ci_grid_rank,
         )
-        return grid_rank.value
+        return self._ci_grid_rank.value
 
     def get_grid_size(self, grid: int) -> int:
-        grid_size = c_int(0)
-        c_grid = c_int(grid)
+        self._ci_grid_size_grid.value = grid
         self._execute_function(
-            self.lib.get_grid_size,
-            byref(c_grid),
-            byref(grid_size),
+            self._fn_get_grid_size,
+            self._ci_grid_size_grid,
+            self._ci_grid_size,
         )
-        return grid_size.value
+        return self._ci_grid_size.value
 
     def get_grid_type(self, grid: int) -> str:
-        len_grid_type = self.get_constant_int("BMI_LENGRIDTYPE")
-        grid_type = create_string_buffer(len_grid_type)
-        c_grid = c_int(grid)
+        grid_type = self._string_buffer("BMI_LENGRIDTYPE")
+        self._ci_grid_type_grid.value = grid
         self._execute_function(
-            self.lib.get_grid_type,
-            byref(c_grid),
+            self._fn_get_grid_type,
+            self._ci_grid_type_grid,
             byref(grid_type),
         )
         return grid_type.value.decode()
 
     def get_grid_shape(self, grid: int, shape: NDArray[np.int32]) -> NDArray[np.int32]:
-        c_grid = c_int(grid)
+        self._ci_grid_shape_grid.value = grid
         self._execute_function(
-            self.lib.get_grid_shape,
-            byref(c_grid),
+            self._fn_get_grid_shape,
+            self._ci_grid_shape_grid,
             c_void_p(shape.ctypes.data),
         )
         return shape
@@ -569,54 +761,52 @@ class XmiWrapper(Xmi):
         raise NotImplementedError
 
     def get_grid_x(self, grid: int, x: NDArray[np.float64]) -> NDArray[np.float64]:
-        c_grid = c_int(grid)
+        self._ci_grid_x_grid.value = grid
         self._execute_function(
-            self.lib.get_grid_x,
-            byref(c_grid),
+            self._fn_get_grid_x,
+            self._ci_grid_x_grid,
             c_void_p(x.ctypes.data),
         )
         return x
 
     def get_grid_y(self, grid: int, y: NDArray[np.float64]) -> NDArray[np.float64]:
-        c_grid = c_int(grid)
+        self._ci_grid_y_grid.value = grid
         self._execute_function(
-            self.lib.get_grid_y,
-            byref(c_grid),
+            self._fn_get_grid_y,
+            self._ci_grid_y_grid,
             c_void_p(y.ctypes.data),
         )
         return y
 
     def get_grid_z(self, grid: int, z: NDArray[np.float64]) -> NDArray[np.float64]:
-        c_grid = c_int(grid)
+        self._ci_grid_z_grid.value = grid
         self._execute_function(
-            self.lib.get_grid_z,
-            byref(c_grid),
+            self._fn_get_grid_z,
+            self._ci_grid_z_grid,
             c_void_p(z.ctypes.data),
         )
         return z
 
     def get_grid_node_count(self, grid: int) -> int:
-        grid_node_count = c_int(0)
-        c_grid = c_int(grid)
+        self._ci_grid_node_count_grid.value = grid
         self._execute_function(
-            self.lib.get_grid_node_count,
-            byref(c_grid),
-            byref(grid_node_count),
+            self._fn_get_grid_node_count,
+            self._ci_grid_node_count_grid,
+            self._ci_grid_node_count,
         )
-        return grid_node_count.value
+        return self._ci_grid_node_count.value
 
     def get_grid_edge_count(self, grid: int) -> int:
         raise NotImplementedError
 
     def get_grid_face_count(self, grid: int) -> int:
-        grid_face_count = c_int(0)
-        c_grid = c_int(grid)
+        self._ci_grid_face_count_grid.value = grid
         self._execute_function(
-            self.lib.get_grid_face_count,
-            byref(c_grid),
-            byref(grid_face_count),
+            self._fn_get_grid_face_count,
+            self._ci_grid_face_count_grid,
+            self._ci_grid_face_count,
         )
-        return grid_face_count.value
+        return self._ci_grid_face_count.value
 
     def get_grid_edge_nodes(
         self, grid: int, edge_nodes: NDArray[np.int32]
@@ -631,10 +821,10 @@ class XmiWrapper(Xmi):
     def get_grid_face_nodes(
         self, grid: int, face_nodes: NDArray[np.int32]
     ) -> NDArray[np.int32]:
-        c_grid = c_int(grid)
+        self._ci_grid_face_nodes_grid.value = grid
         self._execute_function(
-            self.lib.get_grid_face_nodes,
-            byref(c_grid),
+            self._fn_get_grid_face_nodes,
+            self._ci_grid_face_nodes_grid,
             c_void_p(face_nodes.ctypes.data),
         )
         return face_nodes
@@ -642,10 +832,10 @@ class XmiWrapper(Xmi):
     def get_grid_nodes_per_face(
         self, grid: int, nodes_per_face: NDArray[np.int32]
     ) -> NDArray[np.int32]:
-        c_grid = c_int(grid)
+        self._ci_grid_nodes_per_face_grid.value = grid
         self._execute_function(
-            self.lib.get_grid_nodes_per_face,
-            byref(c_grid),
+            self._fn_get_grid_nodes_per_face,
+            self._ci_grid_nodes_per_face_grid,
             c_void_p(nodes_per_face.ctypes.data),
         )
         return nodes_per_face
@@ -654,63 +844,124 @@ class XmiWrapper(Xmi):
     # here starts the XMI
     # ===========================
     def prepare_time_step(self, dt: float) -> None:
-        with cd(self.working_directory):
-            c_dt = c_double(dt)
-            self._execute_function(self.lib.prepare_time_step, byref(c_dt))
+        with self._working_directory():
+            self._cd_prepare_time_step.value = dt
+            self._execute_function(
+                self._fn_prepare_time_step, self._cd_prepare_time_step
+            )
 
     def do_time_step(self) -> None:
-        with cd(self.working_directory):
-            self._execute_function(self.lib.do_time_step)
+        with self._working_directory():
+            self._execute_function(self._fn_do_time_step)
 
     def finalize_time_step(self) -> None:
-        with cd(self.working_directory):
-            self._execute_function(self.lib.finalize_time_step)
+        with self._working_directory():
+            self._execute_function(self._fn_finalize_time_step)
 
     def get_subcomponent_count(self) -> int:
-        count = c_int(0)
-        self._execute_function(self.lib.get_subcomponent_count, byref(count))
-        return count.value
+        self._execute_function(
+            self._fn_get_subcomponent_count, self._ci_subcomponent_count
+        )
+        return self._ci_subcomponent_count.value
 
     def prepare_solve(self, component_id: int = 1) -> None:
-        cid = c_int(component_id)
-        with cd(self.working_directory):
-            self._execute_function(self.lib.prepare_solve, byref(cid))
+        self._ci_prepare_solve_component.value = component_id
+        with self._working_directory():
+            self._execute_function(
+                self._fn_prepare_solve, self._ci_prepare_solve_component
+            )
 
     def solve(self, component_id: int = 1) -> bool:
-        cid = c_int(component_id)
-        has_converged = c_int(0)
-        with cd(self.working_directory):
-            self._execute_function(self.lib.solve, byref(cid), byref(has_converged))
-        return has_converged.value == 1
+        self._ci_solve_component.value = component_id
+        with self._working_directory():
+            self._execute_function(
+                self._fn_solve, self._ci_solve_component, self._ci_solve_converged
+            )
+        return self._ci_solve_converged.value == 1
 
     def finalize_solve(self, component_id: int = 1) -> None:
-        cid = c_int(component_id)
+        self._ci_finalize_solve_component.value = component_id
 
-        with cd(self.working_directory):
-            self._execute_function(self.lib.finalize_solve, byref(cid))
+        with self._working_directory():
+            self._execute_function(
+                self._fn_finalize_solve, self._ci_finalize_solve_component
+            )
 
     def get_var_address(
         self, var_name: str, component_name: str, subcomponent_name: str = ""
     ) -> str:
-        len_var_address = self.get_constant_int("BMI_LENVARADDRESS")
-        var_address = create_string_buffer(len_var_address)
+        var_address = self._string_buffer("BMI_LENVARADDRESS")
         self._execute_function(
-            self.lib.get_var_address,
-            c_char_p(component_name.upper().encode()),
-            c_char_p(subcomponent_name.upper().encode()),
-            c_char_p(var_name.upper().encode()),
+            self._fn_get_var_address,
+            self._upper_bytes(component_name),
+            self._upper_bytes(subcomponent_name),
+            self._upper_bytes(var_name),
             byref(var_address),
         )
 
         return var_address.value.decode()
 
+    def _cname(self, name: str) -> bytes:
+        """Return the variable name encoded for the kernel, cached per name"""
+        try:
+            return self._name_cache[name]
+        except KeyError:
+            c_name = name.encode()
+            self._name_cache[name] = c_name
+            return c_name
+
+    def _upper_bytes(self, name: str) -> bytes:
+        """Return the name upper cased and encoded for the kernel, cached per name"""
+        try:
+            return self._upper_cache[name]
+        except KeyError:
+            c_name = name.upper().encode()
+            self._upper_cache[name] = c_name
+            return c_name
+
+    def _get_var_meta(self, name: str) -> Tuple[int, str, Tuple[int, ...]]:
+        """
+        Return rank, type and shape of a variable, these are queried from the
+        kernel on first use and cached until `finalize` is called
+        """
+        try:
+            return self._var_meta_cache[name]
+        except KeyError:
+            pass
+
+        c_name = self._cname(name)
+        self._execute_function(self._fn_get_var_rank, c_name, self._ci_var_rank)
+        rank = self._ci_var_rank.value
+
+        var_type = self._string_buffer("BMI_LENVARTYPE")
+        self._execute_function(self._fn_get_var_type, c_name, byref(var_type))
+
+        shape = np.zeros(rank, dtype=np.int32)
+        if rank > 0:
+            self._execute_function(
+                self._fn_get_var_shape, c_name, c_void_p(shape.ctypes.data)
+            )
+
+        meta = (rank, var_type.value.decode(), tuple(shape.tolist()))
+        self._var_meta_cache[name] = meta
+        return meta
+
     def _execute_function(
-        self, function: Callable[[Any], int], *args: Any, **kwargs: Any
+        self,
+        function: Callable[..., int],
+        *args: Any,
+        detail: Union[str, None] = None,
     ) -> None:
         """
         Utility function to execute a BMI function in the kernel and checks its status
         """
 
+        # without timing and debug logging, library calls take the fast path
+        if not self.timing and not self.logger.isEnabledFor(logging.DEBUG):
+            if function(*args):
+                self._handle_error(function, args, detail)
+            return
+
         if self.timing:
             self.timer.start(function.__name__)
 
@@ -725,35 +976,38 @@ class XmiWrapper(Xmi):
                     result,
                 )
 
-            if result != Status.SUCCESS:
-                msg = "BMI exception in "
-                msg += repr_function_call(function.__name__, *args)
-
-                # try to get detailed error msg, beware:
-                # directly call CDLL methods to avoid recursion
-                try:
-                    len_err_msg = self.get_constant_int("BMI_LENERRMESSAGE")
-                    err_msg = create_string_buffer(len_err_msg)
-                    self.lib.get_last_bmi_error(byref(err_msg))
-
-                    len_name = self.get_constant_int("BMI_LENCOMPONENTNAME")
-                    component_name = create_string_buffer(len_name)
-                    self.lib.get_component_name(byref(component_name))
-
-                    if "detail" in kwargs:
-                        detail = f", details : '{kwargs['detail']}'"
-                    else:
-                        detail = ""
-                    msg += (
-                        f": Message from {component_name.value.decode()} "
-                        + f"'{err_msg.value.decode()}'"
-                        + detail
-                    )
-                except AttributeError:
-                    self.logger.error("Couldn't extract error message")
-
-                raise XMIError(msg)
+            # Status.SUCCESS is 0, any other result is a failure
+            if result:
+                self._handle_error(function, args, detail)
 
         finally:
             if self.timing:
                 self.timer.stop(function.__name__)
+
+    def _handle_error(
+        self,
+        function: Callable[..., int],
+        args: Tuple[Any, ...],
+        detail: Union[str, None],
+    ) -> NoReturn:
+        msg = "BMI exception in "
+        msg += repr_function_call(function.__name__, *args)
+
+        # try to get detailed error msg, beware:
+        # directly call CDLL methods to avoid recursion
+        try:
+            err_msg = self._string_buffer("BMI_LENERRMESSAGE")
+            self.lib.get_last_bmi_error(byref(err_msg))
+
+            component_name = self._string_buffer("BMI_LENCOMPONENTNAME")
+            self.lib.get_component_name(byref(component_name))
+
+            msg += (
+                f": Message from {component_name.value.decode()} "
+                + f"'{err_msg.value.decode()}'"
+                + (f", details : '{detail}'" if detail is not None else "")
+            )
+        except AttributeError:
+            self.logger.error("Couldn't extract error message")
+
+        raise XMIError(msg)